@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Audio Embedding Cache for Gemma-3n
+Keeps processor audio features and audio encoder outputs keyed by audio content hash,
+in memory (LRU) and on disk, so repeated prompts over the same recording skip the audio tower
+"""
+
+import hashlib
+import os
+from collections import OrderedDict
+
+import torch
+
+
+class AudioEmbeddingCache:
+    def __init__(self, cache_dir=None, max_entries=8, namespace="default", max_disk_bytes=2 * 1024 ** 3):
+        """
+        Initialize the audio embedding cache
+
+        Args:
+            cache_dir: Directory for on-disk entries (None keeps the cache in memory only)
+            max_entries: Maximum number of entries held in memory
+            namespace: Sub-directory used to separate entries from different models
+            max_disk_bytes: Size limit for on-disk entries; least recently used entries are evicted beyond it
+        """
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        self.cache_dir = None
+        if cache_dir:
+            # Encoder outputs depend on the model, so keep one directory per model
+            safe_namespace = namespace.replace("/", "--")
+            self.cache_dir = os.path.join(cache_dir, safe_namespace)
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def hash_audio(audio_path, chunk_size=1024 * 1024):
+        """
+        Compute a SHA-256 hash of the audio file contents
+        """
+        digest = hashlib.sha256()
+        with open(audio_path, 'rb') as f:
+            for block in iter(lambda: f.read(chunk_size), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pt")
+
+    def get(self, key):
+        """
+        Look up an entry, checking memory first and then disk
+
+        Returns:
+            Dict of CPU tensors, or None if the audio has not been cached
+        """
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return self.memory[key]
+
+        if self.cache_dir and os.path.exists(self._disk_path(key)):
+            try:
+                entry = torch.load(self._disk_path(key), map_location="cpu")
+            except Exception as e:
+                print(f"Ignoring unreadable cache entry {key[:12]}: {str(e)}")
+            else:
+                # Bump the mtime so disk eviction treats this entry as recently used
+                os.utime(self._disk_path(key))
+                self._remember(key, entry)
+                self.hits += 1
+                return entry
+
+        self.misses += 1
+        return None
+
+    def put(self, key, entry):
+        """
+        Store an entry in memory and, if configured, on disk
+        """
+        entry = {name: tensor.detach().to("cpu") for name, tensor in entry.items()}
+        self._remember(key, entry)
+
+        if self.cache_dir:
+            # Write to a temporary file first so an interrupted save never leaves a partial entry
+            tmp_path = self._disk_path(key) + ".tmp"
+            torch.save(entry, tmp_path)
+            os.replace(tmp_path, self._disk_path(key))
+            self._evict_disk(keep=key)
+
+        return entry
+
+    def _evict_disk(self, keep=None):
+        """
+        Delete the least recently used on-disk entries until the cache fits in max_disk_bytes
+        """
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".pt"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            if keep is not None and path == self._disk_path(keep):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def _remember(self, key, entry):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def clear_memory(self):
+        """
+        Drop all in-memory entries (on-disk entries are kept)
+        """
+        self.memory.clear()
+
+    def stats(self):
+        """
+        Return a short description of cache usage
+        """
+        return f"{self.hits} hits, {self.misses} misses, {len(self.memory)} in memory"
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Meeting Notes Benchmark
+Compares the two-stage path (transcribe, then GemmaMeetingNotesGenerator.generate_meeting_notes on
+the transcript, as gemma_meeting_notes.py runs it) against the single-pass path (audio straight into
+the multimodal model with the notes prompt)
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from transformers import set_seed
+
+from gemma_3n_audio_transcription import Gemma3nAudioTranscriber
+from gemma_meeting_notes import GemmaMeetingNotesGenerator
+
+TWO_STAGE_NOTES_CODE = "GemmaMeetingNotesGenerator.generate_meeting_notes (gemma_meeting_notes.py)"
+
+def timed_call(memory_budget, fn, *args, **kwargs):
+    """
+    Call fn and return (result, seconds, whether its generation was cut short by max_time)
+    """
+    memory_budget.last_generation = None
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    hit_max_time = bool(memory_budget.last_generation and memory_budget.last_generation["hit_max_time"])
+    return result, elapsed, hit_max_time
+
+def run_two_stage(transcriber, notes_generator, audio_file, meeting_title):
+    """
+    Transcribe the audio, then run the regular transcript-to-notes pipeline on the same model
+    """
+    transcript, transcription_time, transcription_hit_max_time = timed_call(
+        transcriber.memory_budget, transcriber.transcribe_audio, audio_file
+    )
+    notes, notes_time, notes_hit_max_time = timed_call(
+        notes_generator.memory_budget, notes_generator.generate_meeting_notes, transcript or "",
+        meeting_title=meeting_title
+    )
+
+    return {
+        "transcript": transcript,
+        "notes": notes,
+        "transcription_time": transcription_time,
+        "notes_time": notes_time,
+        "total_time": transcription_time + notes_time,
+        "hit_max_time": transcription_hit_max_time or notes_hit_max_time,
+    }
+
+def run_single_pass(transcriber, audio_file, meeting_title):
+    """
+    Generate notes directly from the audio in one generation
+    """
+    notes, total_time, hit_max_time = timed_call(
+        transcriber.memory_budget, transcriber.generate_meeting_notes_from_audio, audio_file, meeting_title=meeting_title
+    )
+
+    return {
+        "notes": notes,
+        "total_time": total_time,
+        "hit_max_time": hit_max_time,
+    }
+
+def warm_up(transcriber, notes_generator, audio_file):
+    """
+    Run the audio tower and a short generation once so neither path pays for cold kernels
+    """
+    print("\n=== Warm-up ===")
+    transcriber.prepare_audio_inputs(audio_file, "Warm-up.")
+    notes_generator.generate_response("Reply with OK.", max_new_tokens=8)
+    transcriber.audio_cache.clear_memory()
+
+def summarize(times):
+    return f"{statistics.mean(times):.1f}s mean, {min(times):.1f}s min"
+
+def write_report(output_file, audio_file, seed, two_stage_runs, single_pass_runs):
+    """
+    Write a markdown report with per-run timings and the notes from the first run of each path
+    """
+    two_stage_mean = statistics.mean(run["total_time"] for run in two_stage_runs)
+    single_pass_mean = statistics.mean(run["total_time"] for run in single_pass_runs)
+    speedup = two_stage_mean / single_pass_mean if single_pass_mean else 0.0
+
+    rows = []
+    for i, (two_stage, single_pass) in enumerate(zip(two_stage_runs, single_pass_runs)):
+        first = "Two-stage" if i % 2 == 0 else "Single-pass"
+        rows.append(
+            f"| {i + 1} | {first} | {two_stage['transcription_time']:.1f}s | {two_stage['notes_time']:.1f}s "
+            f"| {two_stage['total_time']:.1f}s{' (max_time)' if two_stage['hit_max_time'] else ''} "
+            f"| {single_pass['total_time']:.1f}s{' (max_time)' if single_pass['hit_max_time'] else ''} |"
+        )
+    max_time_hits = sum(run["hit_max_time"] for run in two_stage_runs + single_pass_runs)
+
+    report = f"""# Meeting Notes Benchmark
+
+Audio File: {os.path.basename(audio_file)}
+Seed: {seed} (set before every run)
+Runs: {len(two_stage_runs)} per path, alternating which path goes first, after one warm-up
+Two-stage notes: {TWO_STAGE_NOTES_CODE} on the transcript
+Single-pass notes: Gemma3nAudioTranscriber.generate_meeting_notes_from_audio (gemma_3n_audio_transcription.py)
+
+## Latency
+
+| Run | First | Two-stage transcription | Two-stage notes | Two-stage total | Single-pass total |
+|-----|-------|-------------------------|-----------------|-----------------|-------------------|
+{chr(10).join(rows)}
+
+Two-stage: {summarize([run["total_time"] for run in two_stage_runs])}
+Single-pass: {summarize([run["total_time"] for run in single_pass_runs])}
+Single-pass speedup (mean): {speedup:.2f}x
+Runs cut short by max_time: {max_time_hits}
+
+## Two-Stage Notes (run 1)
+
+{two_stage_runs[0]["notes"]}
+
+## Single-Pass Notes (run 1)
+
+{single_pass_runs[0]["notes"]}
+
+## Two-Stage Transcript (run 1)
+
+{two_stage_runs[0]["transcript"]}
+"""
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(report)
+    print(f"Benchmark report saved to: {output_file}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark two-stage vs single-pass meeting notes generation")
+    parser.add_argument("--audio", type=str, required=True,
+                        help="Path to audio file")
+    parser.add_argument("--title", type=str, default="Team Discussion Notes",
+                        help="Title for the meeting notes")
+    parser.add_argument("--runs", type=int, default=3,
+                        help="Runs per path; the order of the two paths alternates between runs (default: 3)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Random seed set before every run so outputs are repeatable (default: 0)")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Path to report file (default: <audio name>_notes_benchmark.md next to the audio)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.audio):
+        print(f"Error: Audio file not found at {args.audio}")
+        return
+
+    if args.output is None:
+        audio_dir = os.path.dirname(args.audio)
+        audio_name = os.path.splitext(os.path.basename(args.audio))[0]
+        output_file = os.path.join(audio_dir, f"{audio_name}_notes_benchmark.md")
+    else:
+        output_file = args.output
+
+    # One model serves both paths, loaded before timing starts; the notes generator reuses it.
+    # The audio cache is memory-only and cleared before each run so no run reuses the encoder outputs.
+    transcriber = Gemma3nAudioTranscriber(cache_dir=None)
+    notes_generator = GemmaMeetingNotesGenerator(transcriber=transcriber)
+    warm_up(transcriber, notes_generator, args.audio)
+
+    two_stage_runs = []
+    single_pass_runs = []
+
+    for i in range(args.runs):
+        # Alternate the order so neither path consistently benefits from running second
+        order = ["two-stage", "single-pass"] if i % 2 == 0 else ["single-pass", "two-stage"]
+        for path in order:
+            print(f"\n=== Run {i + 1}/{args.runs}: {path} ===")
+            transcriber.audio_cache.clear_memory()
+            set_seed(args.seed)
+            if path == "two-stage":
+                two_stage_runs.append(run_two_stage(transcriber, notes_generator, args.audio, args.title))
+            else:
+                single_pass_runs.append(run_single_pass(transcriber, args.audio, args.title))
+
+    print("\n" + "="*60)
+    print(f"Two-stage:   {summarize([run['total_time'] for run in two_stage_runs])}")
+    print(f"Single-pass: {summarize([run['total_time'] for run in single_pass_runs])}")
+    if any(run["hit_max_time"] for run in two_stage_runs + single_pass_runs):
+        print("Warning: some runs were cut short by max_time; their timings and outputs are truncated")
+    print("="*60)
+
+    write_report(output_file, args.audio, args.seed, two_stage_runs, single_pass_runs)
+
+if __name__ == "__main__":
+    main()
@@ -6,17 +6,37 @@ Based on Google AI for Developers documentation
 """
 
 import torch
-from transformers import AutoProcessor, AutoModelForImageTextToText
+from transformers import AutoProcessor, AutoModelForImageTextToText, BatchFeature
+from contextlib import contextmanager
 import os
 import warnings
+from audio_cache import AudioEmbeddingCache
+from gemma_meeting_notes import MAX_LENGTH, build_notes_prompt
+from memory_budget import MemoryBudget
 warnings.filterwarnings("ignore")
 
+DEFAULT_TRANSCRIPTION_PROMPT = "Transcribe this audio file accurately. Provide only the spoken text."
+
 class Gemma3nAudioTranscriber:
-    def __init__(self, model_id="google/gemma-3n-E4B-it"):
+    # Returned by transcribe_audio when the model produced nothing usable (e.g. silence)
+    NO_TRANSCRIPTION = "Unable to extract transcription"
+    
+    def __init__(self, model_id="google/gemma-3n-E4B-it", cache_dir=None, cache_size=8,
+                 cache_max_bytes=2 * 1024 ** 3, max_memory=None):
         """
         Initialize Gemma-3n with native audio processing capabilities
+
+        Args:
+            model_id: Hugging Face model ID
+            cache_dir: Directory for cached audio features and encoder outputs (None for memory only)
+            cache_size: Number of recordings kept in the in-memory cache
+            cache_max_bytes: Size limit of the on-disk cache
+            max_memory: Memory budget such as "8GB" (None for no budget)
         """
         self.model_id = model_id
+        self.audio_cache = AudioEmbeddingCache(cache_dir, max_entries=cache_size, namespace=model_id,
+                                               max_disk_bytes=cache_max_bytes)
+        self.memory_budget = MemoryBudget(max_memory, name="transcriber")
         
         # Check for available devices with Mac GPU (MPS) support
         if torch.backends.mps.is_available():
@@ -39,6 +59,9 @@ class Gemma3nAudioTranscriber:
         else:
             torch_dtype = torch.float32  # Use float32 for CPU
         
+        # Cap weight placement and offload the rest to disk when a memory budget is set
+        torch_dtype, load_kwargs = self.memory_budget.load_settings(self.model_id, self.device, torch_dtype)
+        
         # Load processor and model as per documentation
         self.processor = AutoProcessor.from_pretrained(
             self.model_id, 
@@ -48,66 +71,51 @@ class Gemma3nAudioTranscriber:
         self.model = AutoModelForImageTextToText.from_pretrained(
             self.model_id, 
             torch_dtype=torch_dtype, 
-            device_map="auto"
+            device_map="auto",
+            **load_kwargs
         )
         
         print("Gemma-3n model loaded successfully!")
     
-    def transcribe_audio(self, audio_path, output_path=None):
+    def transcribe_audio(self, audio_path, output_path=None, prompt=DEFAULT_TRANSCRIPTION_PROMPT):
         """
         Transcribe audio using Gemma-3n native audio processing
+
+        Args:
+            audio_path: Path to the audio file
+            output_path: Path to save the result (optional)
+            prompt: Instruction sent alongside the audio (default: plain transcription)
         """
         print(f"Transcribing audio: {audio_path}")
         
         try:
-            # Create messages following the documentation format
-            messages = [
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "audio", "audio": audio_path},
-                        {"type": "text", "text": "Transcribe this audio file accurately. Provide only the spoken text."},
-                    ]
-                }
-            ]
-            
             print("Processing audio with Gemma-3n...")
             
-            # Apply chat template and tokenize
-            input_ids = self.processor.apply_chat_template(
-                messages,
-                add_generation_prompt=True,
-                tokenize=True, 
-                return_dict=True,
-                return_tensors="pt",
-            )
-            
-            # Move to device
-            input_ids = input_ids.to(self.model.device, dtype=self.model.dtype)
+            input_ids, audio_entry = self.prepare_audio_inputs(audio_path, prompt)
             
             print("Generating transcription...")
             
             # Generate transcription
-            with torch.no_grad():
-                # Maximum total token length allowed (prompt + output)
-                max_length = 32768  # Gemma-3n limit
-                
+            with self.cached_audio_tower(audio_entry):
                 # Estimate how many tokens the prompt is taking
                 prompt_tokens = input_ids['input_ids'].shape[-1]  # Already tokenized prompt
                 # Use a reasonable cap for audio transcription (4096 is generous for most audio clips)
-                max_new_tokens = min(max_length - prompt_tokens, 4096)
+                max_new_tokens = min(MAX_LENGTH - prompt_tokens, 4096)
                 
                 print(f"Prompt tokens: {prompt_tokens}, Available for generation: {max_new_tokens} (with 4096 token cap)")
                 
-                outputs = self.model.generate(
-                    **input_ids, 
+                outputs = self.run_generate(
+                    input_ids,
                     max_new_tokens=max_new_tokens,
+                    max_time=120.0,  # Add a 2-minute timeout
                     temperature=0.1,  # Low temperature for accuracy
-                    do_sample=True,
-                    pad_token_id=self.processor.tokenizer.eos_token_id,
-                    max_time=120.0  # Add a 2-minute timeout
+                    do_sample=True
                 )
             
+            # Mark a transcript cut short by the memory budget so it is not mistaken for a complete one
+            truncation_note = self.memory_budget.truncation_note()
+            truncation_section = f"\n=== TRUNCATED ===\n{truncation_note}\n" if truncation_note else ""
+            
             # Decode output
             transcription = self.processor.batch_decode(
                 outputs,
@@ -128,7 +136,7 @@ Processing Method: Native Gemma-3n Audio Processing
 
 TRANSCRIPTION:
 {cleaned_transcription}
-
+{truncation_section}
 === TECHNICAL DETAILS ===
 Device: {self.device}
 Audio Processing: Native Gemma-3n AutoModelForImageTextToText
@@ -149,6 +157,168 @@ Temperature: 0.1 (for accuracy)
             print(f"Error during transcription: {str(e)}")
             return None
     
+    def generate_meeting_notes_from_audio(self, audio_path, output_path=None, meeting_title="Team Meeting"):
+        """
+        Generate structured meeting notes directly from audio in a single generation,
+        skipping the intermediate transcript
+        """
+        print(f"Generating meeting notes directly from audio: {audio_path}")
+        
+        try:
+            input_ids, audio_entry = self.prepare_audio_inputs(audio_path, build_notes_prompt(meeting_title))
+            
+            with self.cached_audio_tower(audio_entry):
+                prompt_tokens = input_ids['input_ids'].shape[-1]
+                # Same cap as the text-only meeting notes generator
+                max_new_tokens = min(MAX_LENGTH - prompt_tokens, 8192)
+                
+                print(f"Prompt tokens: {prompt_tokens}, Available for generation: {max_new_tokens} (with 8192 token cap)")
+                
+                outputs = self.run_generate(
+                    input_ids,
+                    max_new_tokens=max_new_tokens,
+                    max_time=180.0,  # Add a 3-minute timeout
+                    temperature=0.2,  # Lower temperature for more focused output
+                    do_sample=True,
+                    top_p=0.9
+                )
+            
+            # Decode only the generated tokens so the prompt never leaks into the notes
+            meeting_notes = self.processor.batch_decode(
+                outputs[:, prompt_tokens:],
+                skip_special_tokens=True,
+                clean_up_tokenization_spaces=True
+            )[0].strip()
+            
+            # Mark notes cut short by the memory budget so they are not mistaken for complete ones
+            truncation_note = self.memory_budget.truncation_note()
+            if truncation_note:
+                meeting_notes += f"\n\n{truncation_note}"
+            
+            if output_path:
+                with open(output_path, 'w', encoding='utf-8') as f:
+                    f.write(meeting_notes)
+                print(f"Meeting notes saved to: {output_path}")
+            
+            return meeting_notes
+            
+        except Exception as e:
+            print(f"Error during meeting notes generation: {str(e)}")
+            return None
+    
+    @property
+    def last_generation(self):
+        """
+        Timing and stop details of the most recent generation (see MemoryBudget.generate)
+        """
+        return self.memory_budget.last_generation
+    
+    def run_generate(self, inputs, max_new_tokens, **generate_kwargs):
+        """
+        Run model.generate on prepared inputs within the memory budget, if one is set
+        """
+        prompt_tokens = inputs['input_ids'].shape[-1]
+        
+        with torch.no_grad():
+            return self.memory_budget.generate(
+                self.model,
+                self.device,
+                prompt_tokens,
+                max_new_tokens,
+                **inputs,
+                pad_token_id=self.processor.tokenizer.eos_token_id,
+                **generate_kwargs
+            )
+    
+    def build_messages(self, audio_path, prompt):
+        """
+        Create chat messages following the documentation format
+        """
+        return [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "audio", "audio": audio_path},
+                    {"type": "text", "text": prompt},
+                ]
+            }
+        ]
+    
+    def prepare_audio_inputs(self, audio_path, prompt):
+        """
+        Build model inputs for an audio prompt, reusing cached audio features when available
+        
+        Returns:
+            Tuple of (model inputs on device, cache entry with encoder outputs)
+        """
+        messages = self.build_messages(audio_path, prompt)
+        cache_key = self.audio_cache.hash_audio(audio_path)
+        audio_entry = self.audio_cache.get(cache_key)
+        
+        if audio_entry is None:
+            # Cache miss: run feature extraction and the audio encoder once
+            inputs = self.processor.apply_chat_template(
+                messages,
+                add_generation_prompt=True,
+                tokenize=True, 
+                return_dict=True,
+                return_tensors="pt",
+            )
+            inputs = inputs.to(self.model.device, dtype=self.model.dtype)
+            
+            with torch.no_grad():
+                audio_embeds, audio_mask = self.model.model.get_audio_features(
+                    inputs["input_features"], ~inputs["input_features_mask"]
+                )
+            
+            audio_entry = self.audio_cache.put(cache_key, {
+                "input_features": inputs["input_features"],
+                "input_features_mask": inputs["input_features_mask"],
+                "audio_embeds": audio_embeds,
+                "audio_mask": audio_mask,
+            })
+            print(f"Cached audio encoder outputs ({self.audio_cache.stats()})")
+            return inputs, audio_entry
+        
+        # Cache hit: only tokenize the text, expanding the audio placeholder like the processor does
+        print(f"Reusing cached audio encoder outputs ({self.audio_cache.stats()})")
+        prompt_text = self.processor.apply_chat_template(
+            messages,
+            add_generation_prompt=True,
+            tokenize=False,
+        )
+        prompt_text = prompt_text.replace(self.processor.audio_token, self.processor.full_audio_sequence)
+        
+        text_inputs = self.processor.tokenizer(
+            prompt_text,
+            add_special_tokens=False,
+            return_tensors="pt",
+        )
+        inputs = BatchFeature(data={
+            **text_inputs,
+            "input_features": audio_entry["input_features"],
+            "input_features_mask": audio_entry["input_features_mask"],
+        })
+        inputs = inputs.to(self.model.device, dtype=self.model.dtype)
+        
+        return inputs, audio_entry
+    
+    @contextmanager
+    def cached_audio_tower(self, audio_entry):
+        """
+        Serve the audio encoder outputs from the cache instead of running the audio tower
+        """
+        audio_model = self.model.model
+        audio_embeds = audio_entry["audio_embeds"].to(self.model.device, dtype=self.model.dtype)
+        audio_mask = audio_entry["audio_mask"].to(self.model.device)
+        
+        audio_model.get_audio_features = lambda *args, **kwargs: (audio_embeds, audio_mask)
+        try:
+            yield
+        finally:
+            # Drop the instance override so the class method is used again
+            del audio_model.get_audio_features
+    
     def extract_transcription(self, full_text):
         """
         Extract clean transcription from model output
@@ -172,7 +342,7 @@ Temperature: 0.1 (for accuracy)
         cleaned = full_text.replace('<|start_header_id|>', '').replace('<|end_header_id|>', '')
         cleaned = cleaned.replace('<|eot_id|>', '').strip()
         
-        return cleaned if cleaned else "Unable to extract transcription"
+        return cleaned if cleaned else self.NO_TRANSCRIPTION
 
 def main():
     """
@@ -189,6 +359,16 @@ def main():
                         help="Path to original transcript for comparison (optional)")
     parser.add_argument("--compare", action="store_true",
                         help="Enable comparison with original transcript (only useful for sample audio)")
+    parser.add_argument("--prompt", type=str, default=DEFAULT_TRANSCRIPTION_PROMPT,
+                        help="Instruction sent with the audio (e.g. a translation request)")
+    parser.add_argument("--cache-dir", type=str, default=".audio_cache",
+                        help="Directory for cached audio encoder outputs (default: .audio_cache)")
+    parser.add_argument("--memory-cache-only", action="store_true",
+                        help="Keep cached audio encoder outputs in memory only (nothing written to disk)")
+    parser.add_argument("--cache-max-mb", type=int, default=2048,
+                        help="Size limit of the on-disk cache in MB; least recently used entries are evicted (default: 2048)")
+    parser.add_argument("--max-memory", type=str, default=None,
+                        help="Memory budget such as 8GB; offloads weights and limits the KV cache to fit")
     args = parser.parse_args()
     
     # File paths
@@ -225,10 +405,12 @@ def main():
     
     try:
         # Initialize transcriber
-        transcriber = Gemma3nAudioTranscriber()
+        cache_dir = None if args.memory_cache_only else args.cache_dir
+        transcriber = Gemma3nAudioTranscriber(cache_dir=cache_dir, cache_max_bytes=args.cache_max_mb * 1024 ** 2,
+                                              max_memory=args.max_memory)
         
         # Transcribe audio
-        result = transcriber.transcribe_audio(audio_file, output_file)
+        result = transcriber.transcribe_audio(audio_file, output_file, prompt=args.prompt)
         
         print("\n" + "=" * 60)
         print("GEMMA-3N TRANSCRIPTION RESULT:")
@@ -8,14 +8,57 @@ import torch
 from transformers import AutoTokenizer, AutoModelForCausalLM
 import os
 import warnings
+from memory_budget import MemoryBudget
 warnings.filterwarnings("ignore")
 
+# Maximum total token length allowed (prompt + output)
+MAX_LENGTH = 32768  # Gemma-3n limit
+
+def build_notes_prompt(meeting_title, transcript=None):
+    """
+    Build the meeting notes instruction, either over a transcript or over attached audio
+    """
+    if transcript is None:
+        source = "I have an audio recording of a meeting and I need you to convert it into structured meeting notes."
+    else:
+        source = (
+            "I have a transcript from a meeting and I need you to convert it into structured meeting notes.\n\n"
+            f'Transcript:\n"{transcript}"'
+        )
+    
+    return f"""{source}
+
+Please create professional meeting notes with the following sections:
+1. Meeting Title: {meeting_title}
+2. Summary: A brief 2-3 sentence overview of what was discussed
+3. Key Points: Bullet points of the main topics and decisions
+4. Action Items: Any tasks or follow-ups mentioned
+5. Next Steps: What happens next based on this meeting
+
+Format the notes professionally and make them concise and clear."""
+
 class GemmaMeetingNotesGenerator:
-    def __init__(self, model_id="google/gemma-3n-E4B-it"):
+    def __init__(self, model_id="google/gemma-3n-E4B-it", max_memory=None, transcriber=None):
         """
         Initialize Gemma-3n for meeting notes generation
+
+        Args:
+            model_id: Hugging Face model ID
+            max_memory: Memory budget such as "8GB" (None for no budget)
+            transcriber: Loaded Gemma3nAudioTranscriber whose model, tokenizer and memory budget
+                are reused instead of loading a second copy of the weights (optional)
         """
+        if transcriber is not None:
+            self.model_id = transcriber.model_id
+            self.device = transcriber.device
+            self.memory_budget = transcriber.memory_budget
+            self.tokenizer = transcriber.processor.tokenizer
+            self.model = transcriber.model
+            print(f"Using the loaded {self.model_id} for meeting notes generation")
+            return
+        
         self.model_id = model_id
+        self.memory_budget = MemoryBudget(max_memory, name="notes")
         
         # Check for available devices with Mac GPU (MPS) support
         if torch.backends.mps.is_available():
@@ -38,40 +81,81 @@ class GemmaMeetingNotesGenerator:
         else:
             torch_dtype = torch.float32  # Use float32 for CPU
         
+        # Cap weight placement and offload the rest to disk when a memory budget is set
+        torch_dtype, load_kwargs = self.memory_budget.load_settings(self.model_id, self.device, torch_dtype)
+        
         # Load tokenizer and model
         self.tokenizer = AutoTokenizer.from_pretrained(self.model_id)
         self.model = AutoModelForCausalLM.from_pretrained(
             self.model_id,
             torch_dtype=torch_dtype,
-            device_map="auto"
+            device_map="auto",
+            **load_kwargs
         )
         
         print("Model loaded successfully!")
     
+    @property
+    def last_generation(self):
+        """
+        Timing and stop details of the most recent generation (see MemoryBudget.generate)
+        """
+        return self.memory_budget.last_generation
+    
     def generate_meeting_notes(self, transcript, output_path=None, meeting_title="Team Meeting"):
         """
         Generate structured meeting notes from transcript
         """
         print(f"Generating meeting notes from transcript...")
         
-        # Create a prompt template using the chat format
+        # Use a reasonable cap for meeting notes (8192 allows for detailed notes)
+        outputs, _ = self.run_prompt(
+            build_notes_prompt(meeting_title, transcript),
+            max_new_tokens=8192,
+            temperature=0.2,  # Lower temperature for more focused output
+            max_time=180.0  # Add a 3-minute timeout
+        )
+        
+        # Decode the generated text
+        generated_text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+        
+        # Extract the meeting notes (remove the prompt)
+        meeting_notes = self.extract_response(generated_text)
+        
+        # Mark notes cut short by the memory budget so they are not mistaken for complete ones
+        truncation_note = self.memory_budget.truncation_note()
+        if truncation_note:
+            meeting_notes += f"\n\n{truncation_note}"
+        
+        # Save to file if specified
+        if output_path:
+            with open(output_path, 'w', encoding='utf-8') as f:
+                f.write(meeting_notes)
+            print(f"Meeting notes saved to: {output_path}")
+        
+        return meeting_notes
+    
+    def generate_response(self, prompt, max_new_tokens=512, temperature=0.2, max_time=180.0):
+        """
+        Run a single text prompt through the model and return only the newly generated text
+        """
+        outputs, prompt_tokens = self.run_prompt(prompt, max_new_tokens, temperature, max_time)
+        
+        return self.tokenizer.decode(outputs[0][prompt_tokens:], skip_special_tokens=True).strip()
+    
+    def run_prompt(self, prompt, max_new_tokens, temperature=0.2, max_time=180.0):
+        """
+        Apply the chat template to a text prompt and generate, keeping prompt plus output
+        within MAX_LENGTH and the memory budget
+        
+        Returns:
+            Tuple of (output token ids including the prompt, number of prompt tokens)
+        """
         messages = [
             {
                 "role": "user",
                 "content": [
-                    {"type": "text", "text": f"""I have a transcript from a meeting and I need you to convert it into structured meeting notes.
-
-Transcript:
-"{transcript}"
-
-Please create professional meeting notes with the following sections:
-1. Meeting Title: {meeting_title}
-2. Summary: A brief 2-3 sentence overview of what was discussed
-3. Key Points: Bullet points of the main topics and decisions
-4. Action Items: Any tasks or follow-ups mentioned
-5. Next Steps: What happens next based on this meeting
-
-Format the notes professionally and make them concise and clear."""}
+                    {"type": "text", "text": prompt}
                 ]
             }
         ]
@@ -83,41 +167,28 @@ Format the notes professionally and make them concise and clear."""}
             return_tensors="pt"
         ).to(self.device)
         
-        # Generate meeting notes
+        # Estimate how many tokens the prompt is taking
+        prompt_tokens = inputs.shape[-1]  # Already tokenized prompt
+        max_new_tokens = min(MAX_LENGTH - prompt_tokens, max_new_tokens)
+        
+        print(f"Prompt tokens: {prompt_tokens}, Available for generation: {max_new_tokens}")
+        
         with torch.no_grad():
-            # Maximum total token length allowed (prompt + output)
-            max_length = 32768  # Gemma-3n limit
-            
-            # Estimate how many tokens the prompt is taking
-            prompt_tokens = inputs.shape[-1]  # Already tokenized prompt
-            # Use a reasonable cap for meeting notes (8192 allows for detailed notes)
-            max_new_tokens = min(max_length - prompt_tokens, 8192)
-            
-            print(f"Prompt tokens: {prompt_tokens}, Available for generation: {max_new_tokens} (with 8192 token cap)")
-            
-            outputs = self.model.generate(
-                inputs,
-                max_new_tokens=max_new_tokens,
-                temperature=0.2,  # Lower temperature for more focused output
+            # Stays within the memory budget, if one is set
+            outputs = self.memory_budget.generate(
+                self.model,
+                self.device,
+                prompt_tokens,
+                max_new_tokens,
+                max_time=max_time,
+                inputs=inputs,
+                temperature=temperature,
                 do_sample=True,
                 top_p=0.9,
-                pad_token_id=self.tokenizer.eos_token_id,
-                max_time=180.0  # Add a 3-minute timeout
+                pad_token_id=self.tokenizer.eos_token_id
             )
         
-        # Decode the generated text
-        generated_text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-        
-        # Extract the meeting notes (remove the prompt)
-        meeting_notes = self.extract_response(generated_text)
-        
-        # Save to file if specified
-        if output_path:
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(meeting_notes)
-            print(f"Meeting notes saved to: {output_path}")
-        
-        return meeting_notes
+        return outputs, prompt_tokens
     
     def extract_response(self, full_text):
         """
@@ -182,6 +253,34 @@ Format the notes professionally and make them concise and clear."""}
         split_point = int(len(full_text) * 0.3)
         return full_text[split_point:].strip()
 
+def generate_notes_from_audio(audio_file, output_file, meeting_title, max_memory=None):
+    """
+    Single-pass mode: feed the audio straight into the multimodal model with the notes prompt
+    """
+    # Imported here because the transcriber module imports the notes prompt from this one
+    from gemma_3n_audio_transcription import Gemma3nAudioTranscriber
+    
+    if not os.path.exists(audio_file):
+        print(f"Error: Audio file not found at {audio_file}")
+        return
+    
+    try:
+        transcriber = Gemma3nAudioTranscriber(max_memory=max_memory)
+        notes = transcriber.generate_meeting_notes_from_audio(
+            audio_file,
+            output_file,
+            meeting_title=meeting_title
+        )
+        
+        print("\n" + "="*60)
+        print("MEETING NOTES GENERATED (SINGLE PASS):")
+        print("="*60)
+        print(notes)
+        print("="*60)
+        
+    except Exception as e:
+        print(f"Error: {str(e)}")
+
 def main():
     # Parse command line arguments
     import argparse
@@ -192,8 +291,16 @@ def main():
                         help="Path to output file (default: meeting_notes.md in same directory as transcript)")
     parser.add_argument("--title", type=str, default="Team Discussion Notes",
                         help="Title for the meeting notes")
+    parser.add_argument("--audio", type=str, default=None,
+                        help="Generate notes directly from an audio file in a single pass (skips the transcript)")
+    parser.add_argument("--max-memory", type=str, default=None,
+                        help="Memory budget such as 8GB; offloads weights and limits the KV cache to fit")
     args = parser.parse_args()
     
+    if args.audio:
+        generate_notes_from_audio(args.audio, args.output, args.title, args.max_memory)
+        return
+    
     # File paths
     transcript_file = args.transcript
     
@@ -223,7 +330,7 @@ def main():
     
     try:
         # Initialize meeting notes generator
-        generator = GemmaMeetingNotesGenerator()
+        generator = GemmaMeetingNotesGenerator(max_memory=args.max_memory)
         
         # Generate meeting notes
         notes = generator.generate_meeting_notes(
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Incremental Meeting Notes
+Keeps a compact running state (summary, decisions, action items) and folds new transcript
+segments into it with a bounded-size prompt, so each update costs the same regardless of meeting length
+"""
+
+import argparse
+import json
+import os
+import re
+import tempfile
+import time
+
+SECTION_HEADERS = {
+    "SUMMARY:": "summary",
+    "DECISIONS:": "decisions",
+    "ACTION ITEMS:": "action_items",
+}
+
+def split_into_segments(text, segment_chars=2000):
+    """
+    Split transcript text into segments of at most segment_chars, breaking on sentence boundaries
+
+    Segments are packed greedily from the start, so appending text to a transcript
+    only ever changes its last segment.
+    """
+    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
+    segments = []
+    current = ""
+
+    for sentence in sentences:
+        if not sentence:
+            continue
+        # Hard-split sentences that are longer than a whole segment
+        while len(sentence) > segment_chars:
+            if current:
+                segments.append(current)
+                current = ""
+            segments.append(sentence[:segment_chars])
+            sentence = sentence[segment_chars:]
+        if current and len(current) + len(sentence) + 1 > segment_chars:
+            segments.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip()
+
+    if current:
+        segments.append(current)
+    return segments
+
+class IncrementalMeetingNotes:
+    def __init__(self, generator, meeting_title="Team Meeting", max_summary_chars=1200,
+                 max_items=10, max_item_chars=120, segment_chars=2000, max_new_tokens=1024,
+                 max_retries=1, state_path=None, output_path=None):
+        """
+        Initialize the incremental notes engine
+
+        Args:
+            generator: Loaded GemmaMeetingNotesGenerator (or anything with generate_response)
+            meeting_title: Title for the rendered notes
+            max_summary_chars: Upper bound on the running summary length
+            max_items: Upper bound on the number of decisions and action items kept
+            max_item_chars: Upper bound on the length of each decision and action item
+            segment_chars: Upper bound on the transcript text folded in per update
+            max_new_tokens: Token cap for each update generation; must fit a full reply
+                (summary plus both lists at their upper bounds)
+            max_retries: Extra attempts when the model's reply cannot be parsed
+            state_path: Running state JSON, saved after every successful update (optional)
+            output_path: Markdown notes, rewritten after every successful update (optional)
+        """
+        self.generator = generator
+        self.meeting_title = meeting_title
+        self.max_summary_chars = max_summary_chars
+        self.max_items = max_items
+        self.max_item_chars = max_item_chars
+        self.segment_chars = segment_chars
+        self.max_new_tokens = max_new_tokens
+        self.max_retries = max_retries
+        self.state_path = state_path
+        self.output_path = output_path
+
+        self.summary = ""
+        self.decisions = []
+        self.action_items = []
+        # Number of transcript segments (or audio chunks) already folded into the state
+        self.segments_done = 0
+        self.chunk_seconds = None
+
+    def build_update_prompt(self, segment):
+        """
+        Build the fixed-size prompt that folds one segment into the running state
+        """
+        decisions = "\n".join(f"- {item}" for item in self.decisions) or "- None"
+        action_items = "\n".join(f"- {item}" for item in self.action_items) or "- None"
+
+        return f"""You are keeping running notes for a meeting that is still in progress.
+
+Current notes:
+SUMMARY:
+{self.summary or "No discussion yet."}
+DECISIONS:
+{decisions}
+ACTION ITEMS:
+{action_items}
+
+New transcript segment:
+"{segment}"
+
+Update the notes with the new segment. Keep the summary under {self.max_summary_chars} characters,
+keep at most {self.max_items} decisions and {self.max_items} action items, each a single line under
+{self.max_item_chars} characters, merge duplicates, and keep anything from the current notes that is still relevant.
+Reply with exactly these three sections and nothing else:
+SUMMARY:
+<updated summary>
+DECISIONS:
+- <decision>
+ACTION ITEMS:
+- <action item>"""
+
+    def parse_state(self, response):
+        """
+        Parse the model's reply into summary, decisions and action items
+
+        All three section headers must be present. A reply cut off by the token cap is rejected
+        by update() before it gets here, since a cut inside the last list still has every header.
+
+        Returns:
+            True if the state was updated, False if the reply was unusable
+        """
+        sections = {"summary": [], "decisions": [], "action_items": []}
+        seen = set()
+        current = None
+
+        for line in response.split('\n'):
+            stripped = line.strip()
+            header = next((h for h in SECTION_HEADERS if stripped.upper().startswith(h)), None)
+            if header:
+                current = SECTION_HEADERS[header]
+                seen.add(current)
+                remainder = stripped[len(header):].strip()
+                if remainder:
+                    sections[current].append(remainder)
+                continue
+            if current and stripped:
+                sections[current].append(stripped)
+
+        summary = " ".join(sections["summary"]).strip()
+        if seen != set(SECTION_HEADERS.values()) or not summary:
+            return False
+
+        def clean_items(lines):
+            items = []
+            for line in lines:
+                item = line.lstrip("-*• ").strip()
+                item = item[:self.max_item_chars]
+                if item and item.lower() not in ("none", "none.") and item not in items:
+                    items.append(item)
+            return items[:self.max_items]
+
+        self.summary = summary[:self.max_summary_chars]
+        self.decisions = clean_items(sections["decisions"])
+        self.action_items = clean_items(sections["action_items"])
+        return True
+
+    def update(self, segment):
+        """
+        Fold one transcript segment into the running state
+
+        Returns:
+            True if the segment was folded in, False if every attempt produced an unusable reply
+            (the previous state is kept and the segment is not marked as done)
+        """
+        segment = segment.strip()[:self.segment_chars]
+        if not segment:
+            return True
+
+        prompt = self.build_update_prompt(segment)
+        for attempt in range(self.max_retries + 1):
+            response = self.generator.generate_response(prompt, max_new_tokens=self.max_new_tokens)
+            # A reply that ran into the token cap is incomplete even if it parses
+            last_generation = getattr(self.generator, "last_generation", None)
+            if last_generation and last_generation["hit_token_cap"]:
+                print(f"Warning: notes update was cut off at the token cap "
+                      f"(attempt {attempt + 1} of {self.max_retries + 1})")
+                continue
+            if self.parse_state(response):
+                return True
+            print(f"Warning: could not parse notes update (attempt {attempt + 1} of {self.max_retries + 1})")
+
+        return False
+
+    def fold_segment(self, segment):
+        """
+        Fold the next segment and advance the position only if it succeeded
+        """
+        print(f"Folding segment {self.segments_done + 1} ({len(segment)} characters) into notes...")
+        if not self.update(segment):
+            print("Keeping previous notes; this segment will be retried on the next refresh")
+            return False
+
+        self.segments_done += 1
+        self.checkpoint()
+        return True
+
+    def update_from_transcript(self, transcript, in_progress=False):
+        """
+        Fold transcript segments that have not been folded yet into the state
+
+        Progress is tracked by segment index. Appending text to the transcript only changes its
+        last segment, so with in_progress=True that segment is held back until more text arrives.
+        """
+        segments = split_into_segments(transcript, self.segment_chars)
+        if in_progress:
+            segments = segments[:-1]
+
+        for segment in segments[self.segments_done:]:
+            if not self.fold_segment(segment):
+                break
+        return self.render()
+
+    def update_from_audio(self, audio_path, transcriber, chunk_seconds=30.0, follow=False,
+                          poll_interval=10.0, idle_timeout=60.0):
+        """
+        Transcribe an audio file in fixed-length chunks and fold each chunk into the notes
+        as soon as it is transcribed, all on one loaded model
+
+        Progress is tracked by chunk index, which stays aligned with the audio across restarts.
+        With follow=True the file is polled while it grows (e.g. a recording in progress); the
+        trailing partial chunk is only processed once the file stops growing for idle_timeout seconds.
+        """
+        # Imported here so transcript mode does not need the audio libraries
+        import soundfile as sf
+
+        if self.chunk_seconds is not None and self.chunk_seconds != chunk_seconds:
+            raise ValueError(f"State was built with {self.chunk_seconds}s chunks, not {chunk_seconds}s")
+        self.chunk_seconds = chunk_seconds
+
+        last_frames = None
+        idle_since = time.time()
+
+        with tempfile.TemporaryDirectory() as chunk_dir:
+            while True:
+                info = sf.info(audio_path)
+                chunk_frames = int(chunk_seconds * info.samplerate)
+
+                if info.frames != last_frames:
+                    last_frames = info.frames
+                    idle_since = time.time()
+                finished = not follow or time.time() - idle_since >= idle_timeout
+
+                # Only complete chunks, plus the trailing partial one once the recording is finished
+                available = info.frames // chunk_frames
+                if finished and info.frames % chunk_frames:
+                    available += 1
+
+                while self.segments_done < available:
+                    start = self.segments_done * chunk_frames
+                    audio, sample_rate = sf.read(audio_path, start=start, stop=start + chunk_frames)
+                    chunk_path = os.path.join(chunk_dir, f"chunk_{self.segments_done:05d}.wav")
+                    sf.write(chunk_path, audio, sample_rate)
+
+                    segment = transcriber.transcribe_audio(chunk_path)
+                    os.remove(chunk_path)
+                    if segment is None:
+                        return self.render()
+                    if not segment.strip() or segment.strip() == transcriber.NO_TRANSCRIPTION:
+                        # Silence or nothing usable: move past the chunk without calling the model
+                        print(f"No speech in chunk {self.segments_done + 1}, skipping it")
+                        self.segments_done += 1
+                        self.checkpoint()
+                        continue
+                    if not self.fold_segment(segment):
+                        return self.render()
+
+                if finished:
+                    return self.render()
+                time.sleep(poll_interval)
+
+    def checkpoint(self):
+        """
+        Save the running state and current notes, if paths were given
+        """
+        if self.state_path:
+            self.save_state(self.state_path)
+        if self.output_path:
+            with open(self.output_path, 'w', encoding='utf-8') as f:
+                f.write(self.render())
+
+    def render(self):
+        """
+        Render the current state as markdown meeting notes
+        """
+        decisions = "\n".join(f"* {item}" for item in self.decisions) or "* None yet."
+        action_items = "\n".join(f"* {item}" for item in self.action_items) or "* None yet."
+
+        return f"""## 1. Meeting Title: {self.meeting_title}
+
+## 2. Summary:
+{self.summary or "No discussion yet."}
+
+## 3. Key Decisions:
+{decisions}
+
+## 4. Action Items:
+{action_items}
+"""
+
+    def save_state(self, state_path):
+        """
+        Save the running state as JSON so updates can resume later
+        """
+        state = {
+            "meeting_title": self.meeting_title,
+            "summary": self.summary,
+            "decisions": self.decisions,
+            "action_items": self.action_items,
+            "segments_done": self.segments_done,
+            "segment_chars": self.segment_chars,
+            "chunk_seconds": self.chunk_seconds,
+        }
+        tmp_path = state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, state_path)
+
+    def load_state(self, state_path):
+        """
+        Load a running state saved by save_state
+
+        Segment boundaries depend on segment_chars and chunk_seconds, so those come from the state too.
+        """
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        self.meeting_title = state.get("meeting_title", self.meeting_title)
+        self.summary = state.get("summary", "")
+        self.decisions = state.get("decisions", [])
+        self.action_items = state.get("action_items", [])
+        self.segments_done = state.get("segments_done", 0)
+        self.segment_chars = state.get("segment_chars", self.segment_chars)
+        self.chunk_seconds = state.get("chunk_seconds")
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally update meeting notes as a meeting is transcribed")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--audio", type=str,
+                        help="Path to audio file; transcribed in chunks, each folded into the notes as it is done")
+    source.add_argument("--transcript", type=str,
+                        help="Path to transcript file that only grows by appending")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Path to output file (default: <input name>_notes.md next to the input)")
+    parser.add_argument("--state", type=str, default=None,
+                        help="Path to the running state JSON (default: <input name>_notes_state.json)")
+    parser.add_argument("--title", type=str, default="Team Discussion Notes",
+                        help="Title for the meeting notes")
+    parser.add_argument("--segment-chars", type=int, default=2000,
+                        help="Maximum transcript characters folded in per update (default: 2000)")
+    parser.add_argument("--chunk-seconds", type=float, default=30.0,
+                        help="Audio chunk length for --audio (default: 30)")
+    parser.add_argument("--follow", action="store_true",
+                        help="With --audio, keep polling the file while the recorder writes to it "
+                             "(record_audio.py only writes when recording stops)")
+    parser.add_argument("--in-progress", action="store_true",
+                        help="With --transcript, hold back the last segment because more text is coming")
+    parser.add_argument("--max-memory", type=str, default=None,
+                        help="Memory budget such as 8GB; offloads weights and limits the KV cache to fit")
+    args = parser.parse_args()
+
+    input_file = args.audio or args.transcript
+    if not os.path.exists(input_file):
+        print(f"Error: Input file not found at {input_file}")
+        return
+
+    input_dir = os.path.dirname(input_file)
+    input_name = os.path.splitext(os.path.basename(input_file))[0]
+    output_file = args.output or os.path.join(input_dir, f"{input_name}_notes.md")
+    state_file = args.state or os.path.join(input_dir, f"{input_name}_notes_state.json")
+
+    try:
+        from gemma_meeting_notes import GemmaMeetingNotesGenerator
+        if args.audio:
+            # One model transcribes the chunks and folds them into the notes
+            from gemma_3n_audio_transcription import Gemma3nAudioTranscriber
+            transcriber = Gemma3nAudioTranscriber(max_memory=args.max_memory)
+            generator = GemmaMeetingNotesGenerator(transcriber=transcriber)
+        else:
+            generator = GemmaMeetingNotesGenerator(max_memory=args.max_memory)
+
+        notes_engine = IncrementalMeetingNotes(generator, meeting_title=args.title,
+                                               segment_chars=args.segment_chars,
+                                               state_path=state_file, output_path=output_file)
+
+        if os.path.exists(state_file):
+            notes_engine.load_state(state_file)
+            print(f"Resuming from {state_file} ({notes_engine.segments_done} segments already folded in)")
+
+        if args.audio:
+            notes = notes_engine.update_from_audio(args.audio, transcriber, chunk_seconds=args.chunk_seconds,
+                                                   follow=args.follow)
+        else:
+            with open(args.transcript, 'r', encoding='utf-8') as f:
+                content = f.read()
+                # Extract just the transcription part
+                if "TRANSCRIPTION:" in content:
+                    transcript = content.split("TRANSCRIPTION:")[1].split("===")[0].strip()
+                else:
+                    transcript = content.strip()
+            notes = notes_engine.update_from_transcript(transcript, in_progress=args.in_progress)
+
+        notes_engine.checkpoint()
+        print(f"Meeting notes saved to: {output_file}")
+
+        print("\n" + "="*60)
+        print("MEETING NOTES (INCREMENTAL):")
+        print("="*60)
+        print(notes)
+        print("="*60)
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+
+if __name__ == "__main__":
+    main()
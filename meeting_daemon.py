@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Meeting Watch-Folder Daemon
+Watches a directory for new or changed recordings and runs preprocessing, transcription
+and meeting notes on a warm model, tracking progress in a manifest so restarts never redo finished work
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".flac", ".ogg")
+
+# Files written by the pipeline itself that must never be queued as new recordings
+OUTPUT_SUFFIXES = ("_processed.wav",)
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """
+    Compute a SHA-256 hash of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ProcessingManifest:
+    def __init__(self, manifest_path, retry_failed=False):
+        """
+        Load (or create) the manifest index
+
+        Each entry is keyed by file name and records the content hash, size, mtime,
+        processing status (pending, processing, done, failed) and output paths
+
+        Args:
+            manifest_path: Path to the manifest JSON
+            retry_failed: Requeue files that failed in an earlier run (once, at load time)
+        """
+        self.manifest_path = manifest_path
+        self.entries = {}
+
+        if os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)["files"]
+                if not isinstance(self.entries, dict):
+                    raise ValueError("'files' is not a mapping")
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                # Keep the unreadable manifest for inspection and start over rather than refusing to run
+                backup_path = f"{manifest_path}.corrupt-{int(time.time())}"
+                os.replace(manifest_path, backup_path)
+                print(f"Warning: could not read manifest {manifest_path} ({str(e)}); "
+                      f"moved it to {backup_path}, all recordings will be processed again")
+                self.entries = {}
+
+        # Anything left mid-flight by a previous run was interrupted and must be redone;
+        # earlier failures get one more attempt when requested, later failures in this run stay failed
+        for entry in self.entries.values():
+            if entry.get("status") == "processing" or (retry_failed and entry.get("status") == "failed"):
+                entry["status"] = "pending"
+
+    def save(self):
+        """
+        Write the manifest atomically so a crash never leaves it half-written
+        """
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"files": self.entries}, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def needs_processing(self, name, audio_path):
+        """
+        Decide whether a file is new work, updating the recorded size/mtime/hash as needed
+        """
+        stat = os.stat(audio_path)
+        entry = self.entries.get(name)
+
+        if entry is not None and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            # Unchanged on disk: only queue unfinished work
+            return entry["status"] == "pending"
+
+        # New or touched file: hash it to tell real changes from a bare mtime update
+        file_hash = hash_file(audio_path)
+        if entry is not None and entry["hash"] == file_hash:
+            entry["size"] = stat.st_size
+            entry["mtime"] = stat.st_mtime
+            return entry["status"] == "pending"
+
+        self.entries[name] = {
+            "hash": file_hash,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "status": "pending",
+            "outputs": {},
+            "error": None,
+        }
+        return True
+
+    def set_status(self, name, status, outputs=None, error=None):
+        entry = self.entries[name]
+        entry["status"] = status
+        if outputs is not None:
+            entry["outputs"] = outputs
+        entry["error"] = error
+        self.save()
+
+class MeetingDaemon:
+    def __init__(self, watch_dir, output_dir=None, manifest_path=None, meeting_title="Team Discussion Notes",
+                 single_pass=False, settle_seconds=5.0, retry_failed=False, max_memory=None):
+        """
+        Initialize the watch-folder daemon
+
+        Args:
+            watch_dir: Directory to watch for recordings
+            output_dir: Directory for processed audio, transcripts and notes (default: watch_dir)
+            manifest_path: Path to the manifest index (default: <watch_dir>/.manifest.json)
+            meeting_title: Title for generated meeting notes
+            single_pass: Generate notes straight from audio instead of from the transcript
+            settle_seconds: Skip files modified more recently than this (still being recorded)
+            retry_failed: Requeue files that failed in an earlier run
+            max_memory: Memory budget such as "8GB" for the loaded model (None for no budget)
+        """
+        self.watch_dir = watch_dir
+        self.output_dir = output_dir or watch_dir
+        self.meeting_title = meeting_title
+        self.single_pass = single_pass
+        self.settle_seconds = settle_seconds
+        self.max_memory = max_memory
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.manifest = ProcessingManifest(manifest_path or os.path.join(watch_dir, ".manifest.json"),
+                                           retry_failed=retry_failed)
+
+        # One model is loaded lazily on the first queued file and then kept warm;
+        # it handles transcription and both notes modes
+        self.transcriber = None
+        self.notes_generator = None
+
+    def load_model(self):
+        # Imported here so scanning and manifest handling work without loading torch
+        from gemma_3n_audio_transcription import Gemma3nAudioTranscriber
+        from gemma_meeting_notes import GemmaMeetingNotesGenerator
+
+        if self.transcriber is None:
+            self.transcriber = Gemma3nAudioTranscriber(max_memory=self.max_memory)
+            self.notes_generator = GemmaMeetingNotesGenerator(transcriber=self.transcriber)
+
+    def scan(self):
+        """
+        Return the names of files in the watch directory that need processing
+        """
+        queue = []
+        now = time.time()
+
+        try:
+            names = sorted(os.listdir(self.watch_dir))
+        except OSError as e:
+            print(f"Warning: could not list {self.watch_dir}: {str(e)}")
+            return queue
+
+        for name in names:
+            audio_path = os.path.join(self.watch_dir, name)
+            if not name.lower().endswith(AUDIO_EXTENSIONS) or name.endswith(OUTPUT_SUFFIXES):
+                continue
+            try:
+                if not os.path.isfile(audio_path):
+                    continue
+                if now - os.path.getmtime(audio_path) < self.settle_seconds:
+                    continue
+                if self.manifest.needs_processing(name, audio_path):
+                    queue.append(name)
+            except OSError as e:
+                # Deleted or renamed between listing and reading; pick it up on a later scan if it returns
+                print(f"Skipping {name}: {str(e)}")
+
+        self.manifest.save()
+        return queue
+
+    def process(self, name):
+        """
+        Run preprocessing, transcription and meeting notes for one recording
+        """
+        audio_path = os.path.join(self.watch_dir, name)
+        base_name = os.path.splitext(name)[0]
+        outputs = {
+            "processed_audio": os.path.join(self.output_dir, f"{base_name}_processed.wav"),
+            "notes": os.path.join(self.output_dir, f"{base_name}_notes.md"),
+        }
+        if not self.single_pass:
+            outputs["transcript"] = os.path.join(self.output_dir, f"{base_name}_transcription.txt")
+
+        print(f"\n=== Processing {name} ===")
+        self.manifest.set_status(name, "processing", outputs=outputs)
+
+        try:
+            # Imported here so scanning and manifest handling work without the audio libraries
+            from preprocess_audio import preprocess_audio
+
+            self.load_model()
+
+            if not preprocess_audio(audio_path, outputs["processed_audio"]):
+                raise RuntimeError("preprocessing failed")
+
+            if self.single_pass:
+                # One generation straight from audio; no transcript is produced
+                notes = self.transcriber.generate_meeting_notes_from_audio(
+                    outputs["processed_audio"], outputs["notes"], meeting_title=self.meeting_title
+                )
+            else:
+                transcript = self.transcriber.transcribe_audio(outputs["processed_audio"], outputs["transcript"])
+                if transcript is None:
+                    raise RuntimeError("transcription failed")
+
+                notes = self.notes_generator.generate_meeting_notes(
+                    transcript, outputs["notes"], meeting_title=self.meeting_title
+                )
+            if notes is None:
+                raise RuntimeError("meeting notes generation failed")
+
+        except Exception as e:
+            print(f"Error processing {name}: {str(e)}")
+            self.manifest.set_status(name, "failed", error=str(e))
+            return False
+
+        self.manifest.set_status(name, "done")
+        print(f"Finished {name}")
+        return True
+
+    def run(self, poll_interval=10.0, once=False):
+        """
+        Poll the watch directory and process new work until interrupted
+        """
+        print(f"Watching {self.watch_dir} for recordings (every {poll_interval:.0f}s)...")
+
+        while True:
+            for name in self.scan():
+                self.process(name)
+
+            if once:
+                break
+            time.sleep(poll_interval)
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch a directory and process new recordings with Gemma-3n")
+    parser.add_argument("--watch", type=str, default="meetings",
+                        help="Directory to watch for recordings (default: meetings)")
+    parser.add_argument("--output-dir", type=str, default=None,
+                        help="Directory for processed audio, transcripts and notes (default: watch directory)")
+    parser.add_argument("--manifest", type=str, default=None,
+                        help="Path to the manifest index (default: <watch dir>/.manifest.json)")
+    parser.add_argument("--title", type=str, default="Team Discussion Notes",
+                        help="Title for the meeting notes")
+    parser.add_argument("--single-pass", action="store_true",
+                        help="Generate notes straight from audio instead of from the transcript")
+    parser.add_argument("--poll-interval", type=float, default=10.0,
+                        help="Seconds between directory scans (default: 10)")
+    parser.add_argument("--settle-seconds", type=float, default=5.0,
+                        help="Ignore files modified in the last N seconds, e.g. still recording (default: 5)")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="Requeue files that failed in an earlier run")
+    parser.add_argument("--max-memory", type=str, default=None,
+                        help="Memory budget such as 8GB for the loaded model")
+    parser.add_argument("--once", action="store_true",
+                        help="Process pending work once and exit instead of watching")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.watch):
+        print(f"Error: Watch directory not found at {args.watch}")
+        return
+
+    daemon = MeetingDaemon(
+        args.watch,
+        output_dir=args.output_dir,
+        manifest_path=args.manifest,
+        meeting_title=args.title,
+        single_pass=args.single_pass,
+        settle_seconds=args.settle_seconds,
+        retry_failed=args.retry_failed,
+        max_memory=args.max_memory,
+    )
+
+    try:
+        daemon.run(poll_interval=args.poll_interval, once=args.once)
+    except KeyboardInterrupt:
+        print("\nDaemon stopped by user")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Memory Budget for Gemma-3n
+Plans weight placement (with disk offload) and caps generation so the KV cache stays within
+a memory budget, marks output cut short by that cap, and reports peak usage against the budget after each run
+"""
+
+import os
+import re
+import resource
+import sys
+import time
+
+import torch
+from transformers import AutoConfig
+
+UNITS = {
+    "": 1, "B": 1,
+    "KB": 1000, "MB": 1000 ** 2, "GB": 1000 ** 3, "TB": 1000 ** 4,
+    "KIB": 1024, "MIB": 1024 ** 2, "GIB": 1024 ** 3, "TIB": 1024 ** 4,
+}
+
+def parse_memory(value):
+    """
+    Parse a memory size such as "8GB", "6GiB" or "512MB" into bytes
+    """
+    match = re.fullmatch(r'\s*([\d.]+)\s*([KMGT]?I?B?)\s*', str(value).upper())
+    if not match or match.group(2) not in UNITS:
+        raise ValueError(f"Invalid memory size: {value} (expected e.g. 8GB, 6GiB, 512MB)")
+    return int(float(match.group(1)) * UNITS[match.group(2)])
+
+def format_memory(num_bytes):
+    return f"{num_bytes / 1024 ** 3:.2f} GiB"
+
+def reset_host_peak():
+    """
+    Reset the kernel's peak resident set size (VmHWM) so the next reading covers only what follows
+
+    Returns:
+        True if the counter was reset (Linux), False if only the lifetime peak is available
+    """
+    try:
+        with open("/proc/self/clear_refs", 'w') as f:
+            f.write("5")
+    except OSError:
+        return False
+    return True
+
+def host_peak_bytes():
+    """
+    Peak resident set size of this process since the last reset_host_peak (or since start)
+    """
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+def kv_cache_bytes(config, dtype, num_tokens):
+    """
+    Estimate KV-cache size for a sequence of num_tokens
+
+    Sliding-window layers only keep their window, and Gemma-3n layers that share
+    another layer's KV cache are not counted.
+    """
+    text_config = getattr(config, "text_config", config)
+    bytes_per_value = torch.finfo(dtype).bits // 8
+
+    num_layers = text_config.num_hidden_layers - (getattr(text_config, "num_kv_shared_layers", 0) or 0)
+    head_dim = getattr(text_config, "head_dim", None) or text_config.hidden_size // text_config.num_attention_heads
+    per_layer_token = 2 * text_config.num_key_value_heads * head_dim * bytes_per_value
+
+    layer_types = getattr(text_config, "layer_types", None) or ["full_attention"] * num_layers
+    sliding_window = getattr(text_config, "sliding_window", None)
+
+    total = 0
+    for layer_type in layer_types[:num_layers]:
+        if layer_type == "sliding_attention" and sliding_window:
+            total += per_layer_token * min(num_tokens, sliding_window)
+        else:
+            total += per_layer_token * num_tokens
+    return total
+
+class MemoryBudget:
+    def __init__(self, max_memory=None, name="model", offload_dir=".offload", max_context=32768,
+                 headroom_bytes=256 * 1024 ** 2):
+        """
+        Initialize a memory budget
+
+        Args:
+            max_memory: Budget as bytes or a size string such as "8GB" (None for no budget)
+            name: Name of the model using this budget; each model gets its own offload folder
+            offload_dir: Root directory for weights that do not fit (loaded back via mmap)
+            max_context: Longest sequence the KV-cache reserve is sized for
+            headroom_bytes: Extra reserve for activations on top of the estimated KV cache
+        """
+        if max_memory is None:
+            self.max_bytes = None
+        else:
+            self.max_bytes = parse_memory(max_memory) if isinstance(max_memory, str) else int(max_memory)
+        self.offload_dir = os.path.join(offload_dir, name)
+        self.max_context = max_context
+        self.headroom_bytes = headroom_bytes
+        self.weight_bytes = self.max_bytes
+        self.last_generation = None
+
+    def load_settings(self, model_id, device, torch_dtype):
+        """
+        Pick the weight dtype and from_pretrained keyword arguments for this budget
+
+        Weights get whatever the budget leaves after reserving the estimated KV cache for
+        max_context tokens; that share is split across devices and the rest is offloaded to disk.
+
+        Returns:
+            Tuple of (torch_dtype, extra from_pretrained keyword arguments)
+        """
+        if self.max_bytes is None:
+            return torch_dtype, {}
+
+        # On CPU use bfloat16 instead of full fp32 weights
+        if device.type == "cpu":
+            torch_dtype = torch.bfloat16
+
+        config = AutoConfig.from_pretrained(model_id)
+        kv_reserve = kv_cache_bytes(config, torch_dtype, self.max_context) + self.headroom_bytes
+        self.weight_bytes = max(self.max_bytes - kv_reserve, 0)
+
+        if device.type == "cuda":
+            gpu_index = torch.cuda.current_device()
+            gpu_bytes = min(self.weight_bytes, torch.cuda.mem_get_info(gpu_index)[0])
+            max_memory = {gpu_index: gpu_bytes, "cpu": self.weight_bytes - gpu_bytes}
+        elif device.type == "mps":
+            # Unified memory: the MPS share already comes out of system RAM
+            max_memory = {"mps": self.weight_bytes, "cpu": 0}
+        else:
+            max_memory = {"cpu": self.weight_bytes}
+
+        print(f"Memory budget: {format_memory(self.max_bytes)} "
+              f"({format_memory(kv_reserve)} reserved for KV cache and activations, "
+              f"{format_memory(self.weight_bytes)} for weights, rest offloaded to {self.offload_dir})")
+
+        return torch_dtype, {
+            "max_memory": max_memory,
+            "offload_folder": self.offload_dir,
+        }
+
+    def available_for_kv(self, model):
+        """
+        Bytes left in the budget once the resident weights are accounted for
+        """
+        resident = min(model.get_memory_footprint(), self.weight_bytes)
+        return self.max_bytes - resident
+
+    def plan_max_new_tokens(self, model, prompt_tokens, max_new_tokens):
+        """
+        Cap generation to the longest sequence whose KV cache fits in the budget
+        """
+        available = self.available_for_kv(model)
+        total_tokens = prompt_tokens + max_new_tokens
+
+        if kv_cache_bytes(model.config, model.dtype, total_tokens) <= available:
+            return max_new_tokens
+
+        low, high = 0, total_tokens
+        while low < high:
+            mid = (low + high + 1) // 2
+            if kv_cache_bytes(model.config, model.dtype, mid) <= available:
+                low = mid
+            else:
+                high = mid - 1
+
+        capped_new_tokens = low - prompt_tokens
+        if capped_new_tokens <= 0:
+            raise RuntimeError(f"Prompt of {prompt_tokens} tokens does not fit in the "
+                               f"{format_memory(self.max_bytes)} memory budget")
+
+        print(f"KV cache: capping generation at {capped_new_tokens} tokens (was {max_new_tokens}) "
+              f"to stay within {format_memory(available)}")
+        return capped_new_tokens
+
+    def generate(self, model, device, prompt_tokens, max_new_tokens, max_time=None, **generate_kwargs):
+        """
+        Run model.generate within the budget, if one is set, and record in last_generation
+        how long it took, whether the budget lowered the token cap, and whether the output
+        was cut short by the token cap or by max_time
+        """
+        requested_new_tokens = max_new_tokens
+        if self.max_bytes is not None:
+            max_new_tokens = self.plan_max_new_tokens(model, prompt_tokens, max_new_tokens)
+            host_peak_is_per_run = reset_host_peak()
+            if device.type == "cuda":
+                torch.cuda.reset_peak_memory_stats()
+
+        start = time.perf_counter()
+        outputs = model.generate(max_new_tokens=max_new_tokens, max_time=max_time, **generate_kwargs)
+        elapsed = time.perf_counter() - start
+
+        new_tokens = outputs.shape[-1] - prompt_tokens
+        self.last_generation = {
+            "seconds": elapsed,
+            "new_tokens": new_tokens,
+            "max_new_tokens": max_new_tokens,
+            "requested_new_tokens": requested_new_tokens,
+            "capped_by_budget": max_new_tokens < requested_new_tokens,
+            # Used every allowed token, so the reply most likely stops mid-sentence
+            "hit_token_cap": new_tokens >= max_new_tokens,
+            # Stopped before the token cap once the time limit had passed
+            "hit_max_time": max_time is not None and elapsed >= max_time and new_tokens < max_new_tokens,
+        }
+
+        if self.max_bytes is not None:
+            self.last_generation["peak_bytes"] = self.report_peak(device, host_peak_is_per_run)
+        return outputs
+
+    def truncation_note(self):
+        """
+        Marker for output of the last generation if the budget's token cap cut it short, else None
+        """
+        generation = self.last_generation
+        if not generation or not (generation["capped_by_budget"] and generation["hit_token_cap"]):
+            return None
+        return (f"[Truncated: generation stopped at {generation['max_new_tokens']} tokens "
+                f"(of {generation['requested_new_tokens']} requested) to keep the KV cache within "
+                f"the {format_memory(self.max_bytes)} memory budget]")
+
+    def report_peak(self, device, host_peak_is_per_run=False):
+        """
+        Print host and device memory against the budget
+
+        On Linux the host figure is the peak resident set size during the run (the kernel counter
+        is reset before each generation). Elsewhere it can only be the peak since the process
+        started, load time included, and is labelled as such. On CUDA the device figure is the
+        peak allocation during the run. MPS has no peak counter, so its figure is the current
+        driver allocation after the run.
+        """
+        host_peak = host_peak_bytes()
+        host_label = "host RSS peak this run" if host_peak_is_per_run else "host RSS peak since process start"
+
+        if device.type == "cuda":
+            device_label, device_bytes = "CUDA peak", torch.cuda.max_memory_allocated()
+        elif device.type == "mps":
+            device_label, device_bytes = "MPS current allocation (no peak available)", torch.mps.driver_allocated_memory()
+        else:
+            device_label, device_bytes = None, 0
+
+        total = host_peak + device_bytes
+        status = "within" if total <= self.max_bytes else "OVER"
+        breakdown = f"{host_label} {format_memory(host_peak)}"
+        if device_label:
+            breakdown += f" + {device_label} {format_memory(device_bytes)}"
+
+        print(f"Memory: {breakdown} = {format_memory(total)} of {format_memory(self.max_bytes)} budget "
+              f"({total / self.max_bytes * 100:.0f}%, {status} budget)")
+        return total
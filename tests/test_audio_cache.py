@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from audio_cache import AudioEmbeddingCache
+
+
+def make_entry(value):
+    return {"audio_embeds": torch.full((1, 4), float(value))}
+
+
+def test_hash_depends_on_content_only(tmp_path):
+    first = tmp_path / "a.wav"
+    second = tmp_path / "b.wav"
+    first.write_bytes(b"same audio")
+    second.write_bytes(b"same audio")
+
+    assert AudioEmbeddingCache.hash_audio(first) == AudioEmbeddingCache.hash_audio(second)
+
+    second.write_bytes(b"other audio")
+    assert AudioEmbeddingCache.hash_audio(first) != AudioEmbeddingCache.hash_audio(second)
+
+
+def test_memory_hits_misses_and_lru_eviction():
+    cache = AudioEmbeddingCache(max_entries=2)
+
+    assert cache.get("a") is None
+    cache.put("a", make_entry(1))
+    cache.put("b", make_entry(2))
+    assert cache.get("a") is not None  # "a" is now most recently used
+    cache.put("c", make_entry(3))
+
+    assert "b" not in cache.memory
+    assert list(cache.memory) == ["a", "c"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_disk_round_trip(tmp_path):
+    cache = AudioEmbeddingCache(str(tmp_path), namespace="google/gemma-3n-E4B-it")
+    cache.put("key", make_entry(5))
+
+    assert os.path.isdir(tmp_path / "google--gemma-3n-E4B-it")
+
+    # A fresh cache (e.g. a new process) finds the entry on disk
+    reloaded = AudioEmbeddingCache(str(tmp_path), namespace="google/gemma-3n-E4B-it")
+    entry = reloaded.get("key")
+    assert torch.equal(entry["audio_embeds"], torch.full((1, 4), 5.0))
+    assert reloaded.hits == 1
+
+
+def test_disk_eviction_keeps_cache_under_limit(tmp_path):
+    cache = AudioEmbeddingCache(str(tmp_path), max_disk_bytes=1)
+    cache.put("old", make_entry(1))
+    cache.put("new", make_entry(2))
+
+    files = os.listdir(cache.cache_dir)
+    # The newest entry is always kept, older ones are evicted once over the limit
+    assert files == ["new.pt"]
@@ -0,0 +1,120 @@
+import re
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from audio_cache import AudioEmbeddingCache
+from gemma_3n_audio_transcription import Gemma3nAudioTranscriber
+
+AUDIO_TOKEN = "<audio_soft_token>"
+# The real processor expands the placeholder into a begin marker, 188 soft tokens and an end marker
+FULL_AUDIO_SEQUENCE = "<start_of_audio>" + AUDIO_TOKEN * 4 + "<end_of_audio>"
+
+
+class StubTokenizer:
+    eos_token_id = 1
+
+    def __init__(self):
+        self.vocab = {}
+
+    def __call__(self, text, add_special_tokens=True, return_tensors=None):
+        tokens = re.findall(r"<[^>]+>|[^\s<]+", text)
+        ids = [self.vocab.setdefault(token, len(self.vocab) + 3) for token in tokens]
+        if add_special_tokens:
+            ids = [2] + ids  # <bos>
+        return {
+            "input_ids": torch.tensor([ids]),
+            "attention_mask": torch.ones(1, len(ids), dtype=torch.long),
+        }
+
+
+class StubProcessor:
+    """
+    Mirrors Gemma3nProcessor: the chat template renders one audio placeholder, and tokenizing
+    expands it to the full audio sequence and extracts the audio features
+    """
+    audio_token = AUDIO_TOKEN
+    full_audio_sequence = FULL_AUDIO_SEQUENCE
+
+    def __init__(self):
+        self.tokenizer = StubTokenizer()
+
+    def apply_chat_template(self, messages, add_generation_prompt=False, tokenize=False,
+                            return_dict=False, return_tensors=None):
+        parts = [AUDIO_TOKEN if item["type"] == "audio" else item["text"] for item in messages[0]["content"]]
+        text = "<bos><start_of_turn>user\n" + "".join(parts) + "<end_of_turn>\n"
+        if add_generation_prompt:
+            text += "<start_of_turn>model\n"
+        if not tokenize:
+            return text
+
+        # The template already starts with <bos>, so no special tokens are added
+        text_inputs = self.tokenizer(text.replace(self.audio_token, self.full_audio_sequence),
+                                     add_special_tokens=False)
+        return transformers.BatchFeature(data={
+            **text_inputs,
+            "input_features": torch.linspace(0, 1, 48).reshape(1, 6, 8),
+            "input_features_mask": torch.ones(1, 6, dtype=torch.bool),
+        })
+
+
+class StubAudioModel:
+    def __init__(self):
+        self.encoder_calls = 0
+
+    def get_audio_features(self, input_features, input_features_mask):
+        self.encoder_calls += 1
+        return torch.full((1, 4, 16), 7.0), torch.zeros(1, 4, dtype=torch.bool)
+
+
+class StubModel:
+    device = torch.device("cpu")
+    dtype = torch.float32
+
+    def __init__(self):
+        self.model = StubAudioModel()
+
+
+def make_transcriber():
+    # Skip __init__, which downloads and loads the real model
+    transcriber = Gemma3nAudioTranscriber.__new__(Gemma3nAudioTranscriber)
+    transcriber.processor = StubProcessor()
+    transcriber.model = StubModel()
+    transcriber.device = torch.device("cpu")
+    transcriber.audio_cache = AudioEmbeddingCache()
+    return transcriber
+
+
+def test_cache_hit_builds_the_same_inputs_as_a_miss(tmp_path):
+    audio_path = tmp_path / "a.wav"
+    audio_path.write_bytes(b"audio")
+    transcriber = make_transcriber()
+
+    miss_inputs, _ = transcriber.prepare_audio_inputs(str(audio_path), "Transcribe this.")
+    hit_inputs, _ = transcriber.prepare_audio_inputs(str(audio_path), "Transcribe this.")
+
+    assert (transcriber.audio_cache.hits, transcriber.audio_cache.misses) == (1, 1)
+    assert transcriber.model.model.encoder_calls == 1
+    for name in ("input_ids", "attention_mask", "input_features", "input_features_mask"):
+        assert torch.equal(hit_inputs[name], miss_inputs[name]), name
+
+
+def test_cached_audio_tower_is_removed_when_generation_fails(tmp_path):
+    audio_path = tmp_path / "a.wav"
+    audio_path.write_bytes(b"audio")
+    transcriber = make_transcriber()
+    _, audio_entry = transcriber.prepare_audio_inputs(str(audio_path), "Transcribe this.")
+    audio_model = transcriber.model.model
+
+    with pytest.raises(RuntimeError):
+        with transcriber.cached_audio_tower(audio_entry):
+            audio_model.get_audio_features(None, None)
+            raise RuntimeError("generation failed")
+
+    # Served from the cache inside the block, and the real encoder is back afterwards
+    assert audio_model.encoder_calls == 1
+    assert "get_audio_features" not in vars(audio_model)
+    audio_model.get_audio_features(None, None)
+    assert audio_model.encoder_calls == 2
@@ -0,0 +1,123 @@
+import json
+
+import pytest
+
+from incremental_notes import IncrementalMeetingNotes, split_into_segments
+
+GOOD_REPLY = """SUMMARY:
+The team discussed the release.
+DECISIONS:
+- Ship on Friday
+ACTION ITEMS:
+- Alex: write release notes
+"""
+
+
+class FakeGenerator:
+    def __init__(self, replies, hit_token_cap=False):
+        self.replies = list(replies)
+        self.prompts = []
+        self.last_generation = {"hit_token_cap": hit_token_cap}
+
+    def generate_response(self, prompt, max_new_tokens=512):
+        self.prompts.append(prompt)
+        return self.replies.pop(0)
+
+
+class FakeTranscriber:
+    NO_TRANSCRIPTION = "Unable to extract transcription"
+
+    def __init__(self, segments):
+        self.segments = list(segments)
+
+    def transcribe_audio(self, audio_path):
+        return self.segments.pop(0)
+
+
+def test_truncated_reply_keeps_previous_lists():
+    engine = IncrementalMeetingNotes(FakeGenerator([]))
+    assert engine.parse_state(GOOD_REPLY)
+
+    # Cut off by the token cap before ACTION ITEMS
+    assert not engine.parse_state("SUMMARY:\nNew summary.\nDECISIONS:\n- Ship on Monday\n")
+    assert engine.summary == "The team discussed the release."
+    assert engine.action_items == ["Alex: write release notes"]
+
+
+def test_reply_cut_inside_last_section_is_rejected():
+    # Every header is present, but the action items stop mid-list at the token cap
+    cut_reply = "SUMMARY:\nNew summary.\nDECISIONS:\n- Ship on Monday\nACTION ITEMS:\n- a1\n- a"
+    engine = IncrementalMeetingNotes(FakeGenerator([cut_reply, cut_reply], hit_token_cap=True), max_retries=1)
+    engine.parse_state(GOOD_REPLY)
+
+    assert not engine.update("Another point.")
+    assert engine.summary == "The team discussed the release."
+    assert engine.action_items == ["Alex: write release notes"]
+
+
+def test_failed_update_does_not_advance(tmp_path):
+    generator = FakeGenerator(["garbage", "more garbage"])
+    engine = IncrementalMeetingNotes(generator, max_retries=1)
+
+    engine.update_from_transcript("First point. Second point.")
+
+    assert len(generator.prompts) == 2
+    assert engine.segments_done == 0
+
+
+def test_retry_succeeds_and_advances():
+    engine = IncrementalMeetingNotes(FakeGenerator(["garbage", GOOD_REPLY]), max_retries=1)
+    engine.update_from_transcript("First point.")
+
+    assert engine.segments_done == 1
+    assert engine.decisions == ["Ship on Friday"]
+
+
+def test_appended_transcript_resumes_at_segment_boundary():
+    first = "One two three. Four five six. "
+    grown = first + "Seven eight nine. Ten eleven twelve."
+    assert split_into_segments(grown, 20)[:2] == split_into_segments(first, 20)[:2]
+
+    generator = FakeGenerator([GOOD_REPLY] * 10)
+    engine = IncrementalMeetingNotes(generator, segment_chars=20)
+
+    # The last segment may still grow, so it is held back while the meeting is in progress
+    engine.update_from_transcript(first, in_progress=True)
+    assert engine.segments_done == 1
+
+    engine.update_from_transcript(grown)
+    assert engine.segments_done == len(split_into_segments(grown, 20))
+    assert '"Four five six."' in generator.prompts[1]
+
+
+def test_state_round_trip(tmp_path):
+    state_path = str(tmp_path / "state.json")
+    output_path = str(tmp_path / "notes.md")
+    engine = IncrementalMeetingNotes(FakeGenerator([GOOD_REPLY]), segment_chars=50,
+                                     state_path=state_path, output_path=output_path)
+    engine.update_from_transcript("Only point.")
+
+    with open(state_path) as f:
+        assert json.load(f)["segments_done"] == 1
+    assert "Ship on Friday" in open(output_path).read()
+
+    resumed = IncrementalMeetingNotes(FakeGenerator([]))
+    resumed.load_state(state_path)
+    assert (resumed.segments_done, resumed.segment_chars) == (1, 50)
+    assert resumed.action_items == ["Alex: write release notes"]
+
+
+def test_silent_audio_chunks_are_skipped_without_the_model(tmp_path):
+    np = pytest.importorskip("numpy")
+    sf = pytest.importorskip("soundfile")
+    audio_path = str(tmp_path / "meeting.wav")
+    sf.write(audio_path, np.zeros(16000 * 3), 16000)
+
+    generator = FakeGenerator([GOOD_REPLY])
+    engine = IncrementalMeetingNotes(generator)
+    transcriber = FakeTranscriber(["Unable to extract transcription", "", "Ship it on Friday."])
+    engine.update_from_audio(audio_path, transcriber, chunk_seconds=1.0)
+
+    assert engine.segments_done == 3
+    assert len(generator.prompts) == 1
+    assert "Unable to extract" not in generator.prompts[0]
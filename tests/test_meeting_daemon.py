@@ -0,0 +1,126 @@
+import json
+import os
+import time
+
+import meeting_daemon
+from meeting_daemon import MeetingDaemon, ProcessingManifest
+
+
+def write_recording(path, data, age=100):
+    path.write_bytes(data)
+    # Old enough to be past the settle window
+    then = time.time() - age
+    os.utime(path, (then, then))
+
+
+def test_new_file_is_queued_once_done(tmp_path):
+    write_recording(tmp_path / "a.wav", b"audio")
+    daemon = MeetingDaemon(str(tmp_path))
+
+    assert daemon.scan() == ["a.wav"]
+    daemon.manifest.set_status("a.wav", "done")
+    assert daemon.scan() == []
+
+
+def test_touched_file_with_same_hash_is_not_requeued(tmp_path):
+    recording = tmp_path / "a.wav"
+    write_recording(recording, b"audio")
+    daemon = MeetingDaemon(str(tmp_path))
+    daemon.scan()
+    daemon.manifest.set_status("a.wav", "done")
+
+    write_recording(recording, b"audio", age=50)
+
+    assert daemon.scan() == []
+    entry = daemon.manifest.entries["a.wav"]
+    assert entry["status"] == "done"
+    assert entry["mtime"] == os.stat(recording).st_mtime
+
+
+def test_changed_content_is_requeued(tmp_path):
+    recording = tmp_path / "a.wav"
+    write_recording(recording, b"audio")
+    daemon = MeetingDaemon(str(tmp_path))
+    daemon.scan()
+    old_hash = daemon.manifest.entries["a.wav"]["hash"]
+    daemon.manifest.set_status("a.wav", "done")
+
+    write_recording(recording, b"new audio", age=50)
+
+    assert daemon.scan() == ["a.wav"]
+    assert daemon.manifest.entries["a.wav"]["hash"] != old_hash
+    assert daemon.manifest.entries["a.wav"]["status"] == "pending"
+
+
+def test_interrupted_processing_becomes_pending_after_restart(tmp_path):
+    write_recording(tmp_path / "a.wav", b"audio")
+    daemon = MeetingDaemon(str(tmp_path))
+    daemon.scan()
+    daemon.manifest.set_status("a.wav", "processing")
+
+    restarted = MeetingDaemon(str(tmp_path))
+    assert restarted.manifest.entries["a.wav"]["status"] == "pending"
+    assert restarted.scan() == ["a.wav"]
+
+
+def test_failed_files_only_retried_on_request(tmp_path):
+    write_recording(tmp_path / "a.wav", b"audio")
+    daemon = MeetingDaemon(str(tmp_path))
+    daemon.scan()
+    daemon.manifest.set_status("a.wav", "failed", error="boom")
+
+    assert MeetingDaemon(str(tmp_path)).scan() == []
+    assert MeetingDaemon(str(tmp_path), retry_failed=True).scan() == ["a.wav"]
+
+
+def test_retried_failure_is_not_requeued_again_in_the_same_run(tmp_path):
+    write_recording(tmp_path / "a.wav", b"audio")
+    daemon = MeetingDaemon(str(tmp_path))
+    daemon.scan()
+    daemon.manifest.set_status("a.wav", "failed", error="boom")
+
+    restarted = MeetingDaemon(str(tmp_path), retry_failed=True)
+    assert restarted.scan() == ["a.wav"]
+    restarted.manifest.set_status("a.wav", "failed", error="boom again")
+
+    # Failing again in this run does not put it back in the queue on every poll
+    assert restarted.scan() == []
+    assert restarted.scan() == []
+
+
+def test_outputs_and_recent_files_are_skipped(tmp_path):
+    write_recording(tmp_path / "a_processed.wav", b"output")
+    write_recording(tmp_path / "notes.md", b"text")
+    write_recording(tmp_path / "recording.wav", b"still recording", age=0)
+
+    assert MeetingDaemon(str(tmp_path)).scan() == []
+
+
+def test_file_removed_during_scan_is_skipped(tmp_path, monkeypatch):
+    write_recording(tmp_path / "a.wav", b"audio")
+    write_recording(tmp_path / "b.wav", b"audio")
+    daemon = MeetingDaemon(str(tmp_path))
+
+    real_hash_file = meeting_daemon.hash_file
+
+    def vanishing_hash_file(path):
+        # a.wav disappears after the directory listing
+        if path.endswith("a.wav"):
+            raise FileNotFoundError(path)
+        return real_hash_file(path)
+
+    monkeypatch.setattr(meeting_daemon, "hash_file", vanishing_hash_file)
+    assert daemon.scan() == ["b.wav"]
+    assert "a.wav" not in daemon.manifest.entries
+
+
+def test_corrupt_manifest_is_moved_aside(tmp_path):
+    manifest_path = tmp_path / ".manifest.json"
+    manifest_path.write_text("{not json")
+
+    manifest = ProcessingManifest(str(manifest_path))
+
+    assert manifest.entries == {}
+    assert any(name.startswith(".manifest.json.corrupt-") for name in os.listdir(tmp_path))
+    manifest.save()
+    assert json.loads(manifest_path.read_text()) == {"files": {}}
@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from memory_budget import MemoryBudget, kv_cache_bytes, parse_memory
+
+# Layer layout shaped like Gemma-3n E4B: 35 layers, the last 15 reuse earlier KV caches
+TEXT_CONFIG = SimpleNamespace(
+    num_hidden_layers=35,
+    num_kv_shared_layers=15,
+    num_key_value_heads=2,
+    head_dim=256,
+    hidden_size=2048,
+    num_attention_heads=8,
+    layer_types=(["sliding_attention"] * 4 + ["full_attention"]) * 7,
+    sliding_window=512,
+)
+CONFIG = SimpleNamespace(text_config=TEXT_CONFIG)
+
+
+def test_parse_memory():
+    assert parse_memory("8GB") == 8 * 1000 ** 3
+    assert parse_memory("6GiB") == 6 * 1024 ** 3
+    assert parse_memory("512mb") == 512 * 1000 ** 2
+    with pytest.raises(ValueError):
+        parse_memory("lots")
+
+
+def test_kv_estimate_counts_only_own_cache_layers_and_windows():
+    per_layer_token = 2 * 2 * 256 * 2
+    # 20 non-shared layers: 16 sliding (capped at the window) and 4 full
+    expected = 16 * per_layer_token * 512 + 4 * per_layer_token * 32768
+    assert kv_cache_bytes(CONFIG, torch.float16, 32768) == expected
+
+
+def test_generation_is_capped_to_fit():
+    model = SimpleNamespace(config=CONFIG, dtype=torch.float16, get_memory_footprint=lambda: 10 ** 9)
+    budget = MemoryBudget(10 ** 9 + kv_cache_bytes(CONFIG, torch.float16, 3000))
+    budget.weight_bytes = 10 ** 9
+
+    assert budget.plan_max_new_tokens(model, 1000, 1000) == 1000
+    assert budget.plan_max_new_tokens(model, 1000, 4096) == 2000
+
+    with pytest.raises(RuntimeError):
+        budget.plan_max_new_tokens(model, 5000, 100)
+
+
+def test_budget_cap_is_recorded_and_marked():
+    model = SimpleNamespace(
+        config=CONFIG, dtype=torch.float16, get_memory_footprint=lambda: 10 ** 9,
+        # Always runs to the token cap
+        generate=lambda max_new_tokens, **kwargs: SimpleNamespace(shape=(1, 1000 + max_new_tokens)),
+    )
+    budget = MemoryBudget(10 ** 9 + kv_cache_bytes(CONFIG, torch.float16, 3000))
+    budget.weight_bytes = 10 ** 9
+
+    budget.generate(model, torch.device("cpu"), 1000, 1000)
+    assert not budget.last_generation["capped_by_budget"]
+    assert budget.truncation_note() is None
+
+    budget.generate(model, torch.device("cpu"), 1000, 4096)
+    assert budget.last_generation["capped_by_budget"]
+    assert (budget.last_generation["max_new_tokens"], budget.last_generation["requested_new_tokens"]) == (2000, 4096)
+    assert "2000 tokens" in budget.truncation_note()
+
+
+def test_no_budget_leaves_loading_unchanged():
+    budget = MemoryBudget(None)
+    assert budget.load_settings("unused", torch.device("cpu"), torch.float32) == (torch.float32, {})